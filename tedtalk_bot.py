@@ -1,80 +1,270 @@
 import os
 import logging
+import logging.handlers
+import queue
 import asyncio
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 import yt_dlp
 import tempfile
 import shutil
+from pathlib import Path
 import traceback
-import requests # Used for uploading
+import copy
+import time
+import aiohttp # Used for uploading
+from concurrent.futures import ThreadPoolExecutor
 
-# Configure logging
+try:
+    import uvloop # Faster event loop, not available on Windows
+except ImportError:
+    uvloop = None
+
+# Configure logging. The message (and any traceback) is still formatted on the logging thread;
+# the final line formatting and the stderr write happen on a background listener thread,
+# so logging never blocks the event loop or the download threads on stderr
+log_queue = queue.Queue(-1)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.handlers.QueueHandler(log_queue)],
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
 # Bot token is loaded from environment variables
 BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
-TELEGRAM_FILE_LIMIT = 49 * 1024 * 1024  # 49MB to be safe
+# Optional self-hosted Bot API server, e.g. http://localhost:8081. It lifts the upload limit to 2GB.
+# In local mode the server reads downloaded files by path, so DOWNLOAD_DIR must point at a
+# directory the server can see at the same path (e.g. a volume shared by both containers)
+LOCAL_BOT_API_URL = os.getenv("TELEGRAM_API_URL")
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR")  # Base for temp files; defaults to the system temp dir
+if LOCAL_BOT_API_URL:
+    TELEGRAM_FILE_LIMIT = 2000 * 1024 * 1024
+    TELEGRAM_FILE_LIMIT_TEXT = '2GB'
+else:
+    TELEGRAM_FILE_LIMIT = 49 * 1024 * 1024  # 49MB to be safe
+    TELEGRAM_FILE_LIMIT_TEXT = '50MB'
+MAX_DOWNLOAD_WORKERS = 4
+MAX_UPLOAD_WORKERS = 4
+# Large uploads can take a while, so only the connect and per-read steps are bounded
+UPLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+
+TED_HOSTS = ('ted.com', 'www.ted.com')
+MAX_DURATION = int(os.getenv("MAX_DURATION", 30 * 60))  # seconds
+# Talk metadata is reused for repeat requests instead of being fetched again
+INFO_CACHE_SIZE = 256
+INFO_CACHE_TTL = 60 * 60  # seconds
+
+YDL_OPTS = {
+    # Prefer a progressive MP4 that needs no ffmpeg merge; separate streams are only merged as a fallback
+    'format': 'best[ext=mp4][height<=720]/bestvideo[height<=720]+bestaudio/best[height<=720]/best',
+    'merge_output_format': 'mp4',
+    'noplaylist': True,
+    'concurrent_fragment_downloads': 8,
+    'http_chunk_size': 10 * 1024 * 1024,
+    'retries': 3,
+    'fragment_retries': 3,
+    # Send yt-dlp's output through our logger and skip its per-fragment progress lines
+    'logger': logger,
+    'noprogress': True,
+}
+
+# aria2c opens several connections per file, much faster than a single stream
+if shutil.which('aria2c'):
+    YDL_OPTS['external_downloader'] = 'aria2c'
+    YDL_OPTS['external_downloader_args'] = ['-x', '16', '-s', '16', '-k', '1M']
+
+# A job is kept in RAM (tmpfs) only when its expected size fits with this much memory to spare
+SHM_DIR = '/dev/shm'
+SHM_MIN_FREE = 1024 * 1024 * 1024
+# Size estimate for talks without a known file size, generous for 720p
+SHM_BYTES_PER_SECOND = 400 * 1024
+
+# yt-dlp is blocking, so downloads run on this bounded pool instead of the event loop
+DOWNLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS, thread_name_prefix='yt-dlp')
+
+
+def _extract_info(url: str) -> dict:
+    """Fetch a video's raw metadata without selecting formats or downloading. Blocking."""
+    # process=False stops after the extractor, which is enough to check the duration.
+    # Format selection happens later in _run_ydl, only for talks that pass.
+    # YoutubeDL modifies the params dict it is given, so never hand it the shared YDL_OPTS
+    with yt_dlp.YoutubeDL(dict(YDL_OPTS)) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+
+        # Talks hosted elsewhere come back as a link to another extractor, without a title or
+        # duration. Follow it the way yt-dlp's own processing would.
+        while info.get('_type') in ('url', 'url_transparent'):
+            resolved = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+            if info['_type'] == 'url_transparent':
+                overrides = {
+                    k: v for k, v in info.items()
+                    if v is not None and k not in ('_type', 'url', 'id', 'extractor', 'extractor_key', 'ie_key')
+                }
+                resolved = {**resolved, **overrides}
+            info = resolved
+
+        return info
+
+
+def _run_ydl(info: dict, ydl_opts: dict) -> str:
+    """Download a video from already extracted info and return its path. Blocking."""
+    # yt-dlp calls post_hooks with the final path once merging/post-processing is done
+    downloaded_paths = []
+    ydl_opts = {**ydl_opts, 'post_hooks': [downloaded_paths.append]}
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # Processing mutates the info dict, so keep the cached copy intact
+        ydl.process_ie_result(copy.deepcopy(info), download=True)
+
+    return downloaded_paths[-1] if downloaded_paths else None
+
+def _open_for_upload(file_path: str):
+    """Open a file for one front-to-back read, hinting sequential access where supported.
+
+    The hint only matters for files on disk; it does nothing for files on tmpfs.
+    """
+    f = open(file_path, 'rb')
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except OSError:
+        # Some filesystems reject the hint; the read works fine without it
+        pass
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _read_for_upload(file_path: str) -> bytes:
+    """Read a whole file for upload. Blocking."""
+    with _open_for_upload(file_path) as f:
+        return f.read()
+
+
+def _shm_available() -> int:
+    """Return how many bytes can currently be written to tmpfs without exhausting memory."""
+    try:
+        limits = [shutil.disk_usage(SHM_DIR).free]
+    except OSError:
+        return 0
+
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    limits.append(int(line.split()[1]) * 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+
+    # Containers are usually capped by a cgroup (v2) limit well below the host's memory
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            memory_max = f.read().strip()
+        if memory_max != 'max':
+            with open('/sys/fs/cgroup/memory.current') as f:
+                limits.append(int(memory_max) - int(f.read().strip()))
+    except (OSError, ValueError):
+        pass
+
+    return max(min(limits), 0)
 
 class TEDTalkBot:
     def __init__(self):
-        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir = tempfile.mkdtemp(dir=DOWNLOAD_DIR)
+        # RAM-backed dir for small jobs. Not used with a local Bot API server, whose files have to
+        # live in the shared DOWNLOAD_DIR
+        self.shm_dir = None
+        if not LOCAL_BOT_API_URL and os.access(SHM_DIR, os.W_OK):
+            self.shm_dir = tempfile.mkdtemp(dir=SHM_DIR)
+        # Job dir on tmpfs -> bytes reserved for it, so concurrent jobs don't all count the same free memory
+        self.shm_reservations = {}
+        # Two-stage pipeline: downloads and uploads run in separate workers so they overlap
+        self.download_queue = asyncio.Queue()
+        self.upload_queue = asyncio.Queue(maxsize=MAX_UPLOAD_WORKERS)
+        self.workers = []
+        # Shared HTTP session so uploads reuse pooled keep-alive connections; opened in post_init
+        self.http_session = None
+        # Canonical talk URL -> Telegram file_id and caption of a video we already sent
+        self.video_cache = {}
+        # Canonical talk URL -> (expiry time, yt-dlp info); oldest entries are evicted first
+        self.info_cache = {}
+        # Canonical talk URL -> future resolved with the outcome of the job currently handling it
+        self.inflight = {}
         
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send a message when the command /start is issued."""
-        welcome_message = """
+        welcome_message = f"""
 🎬 Welcome to TED Talk Downloader Bot!
 
 Send me a TED Talk URL and I'll download it for you.
 
-For videos under 50MB, I'll send the file directly. For larger videos, I'll provide a temporary download link.
+For videos under {TELEGRAM_FILE_LIMIT_TEXT}, I'll send the file directly. For larger videos, I'll provide a temporary download link.
+Talks longer than {MAX_DURATION // 60} minutes can't be downloaded.
         """
         await update.message.reply_text(welcome_message)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send a message when the command /help is issued."""
-        help_text = """
+        help_text = f"""
 🆘 Help Information:
 
 1. Copy a TED Talk URL from ted.com
 2. Paste it here in the chat.
 3. Wait for the download to complete.
-4. You'll receive either the video file directly (if <50MB) or a download link (if >50MB).
+4. You'll receive either the video file directly (if <{TELEGRAM_FILE_LIMIT_TEXT}) or a download link (if >{TELEGRAM_FILE_LIMIT_TEXT}).
 
+Talks longer than {MAX_DURATION // 60} minutes are not supported.
 Download links are active as long as they are regularly visited.
         """
         await update.message.reply_text(help_text)
 
     def is_ted_url(self, url: str) -> bool:
         """Check if the URL is a valid TED Talk URL."""
-        ted_domains = ['ted.com', 'www.ted.com']
-        return any(domain in url.lower() for domain in ted_domains) and '/talks/' in url.lower()
+        # Only the short scheme/host/path prefixes are lowercased, never the whole message
+        scheme, sep, rest = url.partition('://')
+        if not sep or scheme.lower() not in ('http', 'https'):
+            return False
+        host, _, path = rest.partition('/')
+        return (
+            host.lower() in TED_HOSTS
+            and path[:6].lower() == 'talks/'
+            and len(path) > 6
+            and not path[6].isspace()
+        )
+
+    def canonical_url(self, url: str) -> str:
+        """Normalize a talk URL so the same talk always maps to the same cache key."""
+        url = url.split('#', 1)[0].split('?', 1)[0]
+        return url.lower().rstrip('/')
 
     # --- THIS FUNCTION HAS BEEN REPLACED ---
     async def upload_to_gofile(self, file_path: str) -> dict:
         """Uploads a file to GoFile.io and returns the link."""
         try:
             # Step 1: Get the best server to upload to
-            server_response = requests.get("https://api.gofile.io/getServer")
-            server_response.raise_for_status()
-            server_data = server_response.json()
+            async with self.http_session.get("https://api.gofile.io/getServer") as server_response:
+                server_response.raise_for_status()
+                server_data = await server_response.json()
             if server_data['status'] != 'ok':
                 return {'success': False, 'error': 'Could not get an upload server.'}
             
             server = server_data['data']['server']
             upload_url = f"https://{server}.gofile.io/uploadFile"
 
-            # Step 2: Upload the file
-            with open(file_path, 'rb') as f:
-                files = {'file': f}
-                response = requests.post(upload_url, files=files)
-            
-            response.raise_for_status()
-            upload_data = response.json()
+            # Step 2: Upload the file. aiohttp streams it in chunks instead of loading it into memory.
+            # GoFile only accepts the whole file in a single multipart POST (no ranged or multi-part
+            # uploads), so the parts can't be sent over parallel connections.
+            with _open_for_upload(file_path) as f:
+                data = aiohttp.FormData()
+                data.add_field('file', f, filename=os.path.basename(file_path))
+                async with self.http_session.post(upload_url, data=data) as response:
+                    response.raise_for_status()
+                    upload_data = await response.json()
 
             if upload_data['status'] == 'ok':
                 download_link = upload_data['data']['downloadPage']
@@ -83,125 +273,313 @@ Download links are active as long as they are regularly visited.
                 logger.error(f"GoFile upload failed: {upload_data.get('data', {}).get('reason', 'Unknown reason')}")
                 return {'success': False, 'error': 'File host rejected the upload.'}
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"GoFile upload failed (RequestException): {e}")
+        except aiohttp.ClientError as e:
+            logger.error(f"GoFile upload failed (ClientError): {e}")
             return {'success': False, 'error': 'Failed to communicate with the file hosting service.'}
         except Exception as e:
             logger.error(f"Exception during upload: {traceback.format_exc()}")
             return {'success': False, 'error': 'An exception occurred during file upload.'}
     # --- END OF REPLACEMENT ---
 
-    async def download_ted_talk(self, url: str) -> dict:
-        """Download TED Talk video using yt-dlp."""
+    async def get_talk_info(self, url: str) -> dict:
+        """Return yt-dlp info for a talk, reusing a recent result when there is one."""
+        key = self.canonical_url(url)
+        cached = self.info_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(DOWNLOAD_EXECUTOR, _extract_info, url)
+
+        self.info_cache.pop(key, None)
+        self.info_cache[key] = (time.monotonic() + INFO_CACHE_TTL, info)
+        if len(self.info_cache) > INFO_CACHE_SIZE:
+            del self.info_cache[next(iter(self.info_cache))]
+        return info
+
+    async def download_ted_talk(self, url: str, job_dir: str) -> dict:
+        """Download TED Talk video into job_dir using yt-dlp."""
         try:
-            output_path = os.path.join(self.temp_dir, '%(title)s.%(ext)s')
+            info = await self.get_talk_info(url)
+            title = info.get('title', 'TED Talk')
+
+            duration = info.get('duration')
+            if duration is None:
+                return {'success': False, 'error': "Couldn't determine the length of this talk."}
+            if duration > MAX_DURATION:
+                return {
+                    'success': False,
+                    'error': f'This talk is too long ({duration // 60:.0f} min). The limit is {MAX_DURATION // 60} minutes.'
+                }
+
+            ydl_opts = {**YDL_OPTS, 'outtmpl': os.path.join(job_dir, '%(title)s.%(ext)s')}
             
-            ydl_opts = {
-                'format': 'bestvideo[height<=720]+bestaudio/best[height<=720]/best',
-                'merge_output_format': 'mp4',
-                'outtmpl': output_path,
-                'noplaylist': True,
-            }
+            logger.info(f"Starting download for: {title}")
+            loop = asyncio.get_running_loop()
+            downloaded_file = await loop.run_in_executor(DOWNLOAD_EXECUTOR, _run_ydl, info, ydl_opts)
+            logger.info(f"Finished download for: {title}")
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'TED Talk')
-                
-                logger.info(f"Starting download for: {title}")
-                ydl.download([url])
-                logger.info(f"Finished download for: {title}")
-
-                downloaded_file = None
-                for file in os.listdir(self.temp_dir):
-                    if file.endswith('.mp4'):
-                        downloaded_file = os.path.join(self.temp_dir, file)
-                        break
-                
-                if downloaded_file and os.path.exists(downloaded_file):
-                    file_size = os.path.getsize(downloaded_file)
-                    return {'success': True, 'file_path': downloaded_file, 'title': title, 'file_size': file_size}
-                else:
-                    return {'success': False, 'error': 'Failed to locate the final downloaded video file.'}
+            if downloaded_file and os.path.exists(downloaded_file):
+                file_size = os.path.getsize(downloaded_file)
+                return {'success': True, 'file_path': downloaded_file, 'title': title, 'file_size': file_size}
+            else:
+                return {'success': False, 'error': 'Failed to locate the final downloaded video file.'}
                     
         except Exception as e:
             logger.error(f"Download error: {traceback.format_exc()}")
+            # Cached format URLs may have expired, so extract again on the next attempt
+            self.info_cache.pop(self.canonical_url(url), None)
             return {'success': False, 'error': 'An unexpected error occurred during download.'}
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle incoming messages with URLs."""
         message_text = update.message.text.strip()
         
-        if not message_text.startswith('http') or not self.is_ted_url(message_text):
+        if not self.is_ted_url(message_text):
             await update.message.reply_text("Please send a valid TED Talk URL from ted.com")
             return
         
-        processing_msg = await update.message.reply_text("🔄 Processing your request...")
+        key = self.canonical_url(message_text)
+
+        # Telegram already has this video, so resend it by file_id without downloading or uploading
+        cached = self.video_cache.get(key)
+        if cached:
+            await update.message.reply_video(
+                video=cached['file_id'],
+                caption=cached['caption'],
+                supports_streaming=True
+            )
+            return
         
-        file_path_to_clean = None
+        # The same talk is already being processed for someone else, so share that job's outcome
+        pending = self.inflight.get(key)
+        if pending:
+            processing_msg = await update.message.reply_text("🔄 This talk is already being downloaded, please wait...")
+            outcome = await asyncio.shield(pending)
+            await self.send_outcome(update, processing_msg, outcome)
+            return
+
+        self.inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            processing_msg = await update.message.reply_text("🔄 Processing your request...")
+        except Exception:
+            # Don't leave other requests for this talk waiting on a job that never started
+            self.finish_job(message_text, {'text': "❌ An unexpected error occurred."})
+            raise
+        await self.download_queue.put((update, processing_msg, message_text))
+
+    async def download_worker(self):
+        """Take jobs off the download queue and pass finished files on to the upload stage."""
+        while True:
+            update, processing_msg, url = await self.download_queue.get()
+            try:
+                await self.process_download(update, processing_msg, url)
+            except Exception as e:
+                logger.error(f"Download worker error: {traceback.format_exc()}")
+            finally:
+                self.download_queue.task_done()
+
+    async def upload_worker(self):
+        """Take downloaded files off the upload queue and send them to the user."""
+        while True:
+            update, processing_msg, url, job_dir, download_result = await self.upload_queue.get()
+            try:
+                await self.process_upload(update, processing_msg, url, job_dir, download_result)
+            except Exception as e:
+                logger.error(f"Upload worker error: {traceback.format_exc()}")
+            finally:
+                self.upload_queue.task_done()
+
+    async def process_download(self, update: Update, processing_msg, url: str):
+        """Download a single talk. On success the upload stage takes over the job directory."""
+        job_dir = None
+        handed_off = False
+        outcome = {'text': "❌ An unexpected error occurred."}
         try:
-            download_result = await self.download_ted_talk(message_text)
+            info = await self.get_talk_info(url)
+            # Each job gets its own directory so concurrent downloads never see each other's files
+            job_dir = self.make_job_dir(info)
+            download_result = await self.download_ted_talk(url, job_dir)
             
             if not download_result['success']:
-                await processing_msg.edit_text(f"❌ Error: {download_result['error']}")
+                outcome = {'text': f"❌ Error: {download_result['error']}"}
+                await processing_msg.edit_text(outcome['text'])
                 return
 
+            await self.upload_queue.put((update, processing_msg, url, job_dir, download_result))
+            handed_off = True
+
+        except Exception as e:
+            logger.error(f"General handling error: {traceback.format_exc()}")
+            await processing_msg.edit_text(outcome['text'])
+        finally:
+            # Unless the upload stage owns the job now, it ends here, so waiters must always be released
+            if not handed_off:
+                if job_dir:
+                    self.remove_job_dir(job_dir)
+                self.finish_job(url, outcome)
+
+    async def process_upload(self, update: Update, processing_msg, url: str, job_dir: str, download_result: dict):
+        """Send a downloaded talk to the user, then remove its job directory."""
+        outcome = {'text': "❌ An unexpected error occurred."}
+        try:
             file_path = download_result['file_path']
-            file_path_to_clean = file_path
             file_size = download_result['file_size']
             title = download_result['title']
 
             if file_size < TELEGRAM_FILE_LIMIT:
                 await processing_msg.edit_text("✅ Download complete! Uploading video to Telegram...")
                 try:
-                    with open(file_path, 'rb') as video_file:
-                        await update.message.reply_video(
-                            video=video_file,
-                            caption=f"🎬 {title}\n📊 Size: {file_size / (1024*1024):.1f} MB",
-                            supports_streaming=True
-                        )
-                    await processing_msg.delete()
+                    caption = f"🎬 {title}\n📊 Size: {file_size / (1024*1024):.1f} MB"
+                    video_msg = await self.send_video(update, file_path, caption)
+                    outcome = {'file_id': video_msg.video.file_id, 'caption': caption}
+                    self.video_cache[self.canonical_url(url)] = outcome
                 except Exception as e:
                     logger.error(f"Failed to send video to Telegram: {traceback.format_exc()}")
-                    await processing_msg.edit_text("❌ Error: Failed to upload the video file to Telegram.")
+                    outcome = {'text': "❌ Error: Failed to upload the video file to Telegram."}
+                    await processing_msg.edit_text(outcome['text'])
+                else:
+                    # The video is already sent, so failing to tidy up the status message isn't an upload error
+                    try:
+                        await processing_msg.delete()
+                    except Exception as e:
+                        logger.warning(f"Failed to delete status message: {e}")
 
             else:
                 await processing_msg.edit_text("✅ Download complete! File is too large, uploading to a file host...")
-                # --- THIS LINE HAS BEEN UPDATED ---
                 upload_result = await self.upload_to_gofile(file_path)
-                # --- END OF UPDATE ---
                 if upload_result['success']:
                     link = upload_result['link']
-                    await processing_msg.edit_text(
+                    outcome = {'text': (
                         f"🎬 {title}\n\n"
                         f"🔗 This video is too large for Telegram ({file_size / (1024*1024):.1f} MB).\n\n"
                         f"Here is your download link:\n{link}"
-                    )
+                    )}
                 else:
-                    await processing_msg.edit_text(f"❌ Error: {upload_result['error']}")
+                    outcome = {'text': f"❌ Error: {upload_result['error']}"}
+                await processing_msg.edit_text(outcome['text'])
 
         except Exception as e:
             logger.error(f"General handling error: {traceback.format_exc()}")
-            await processing_msg.edit_text("❌ An unexpected error occurred.")
+            await processing_msg.edit_text(outcome['text'])
         finally:
-            if file_path_to_clean and os.path.exists(file_path_to_clean):
-                os.remove(file_path_to_clean)
+            self.remove_job_dir(job_dir)
+            self.finish_job(url, outcome)
+
+    def finish_job(self, url: str, outcome: dict):
+        """Hand a job's outcome to requests waiting on the same talk and clear its in-flight entry."""
+        pending = self.inflight.pop(self.canonical_url(url), None)
+        if pending and not pending.done():
+            pending.set_result(outcome)
+
+    async def send_outcome(self, update: Update, processing_msg, outcome: dict):
+        """Reply with the outcome of a job that ran for another request of the same talk."""
+        if 'file_id' in outcome:
+            await update.message.reply_video(
+                video=outcome['file_id'],
+                caption=outcome['caption'],
+                supports_streaming=True
+            )
+            await processing_msg.delete()
+        else:
+            await processing_msg.edit_text(outcome['text'])
+
+    def make_job_dir(self, info: dict) -> str:
+        """Create a job directory on tmpfs if the talk fits in memory right now, otherwise on disk."""
+        if self.shm_dir:
+            expected_size = (
+                info.get('filesize') or info.get('filesize_approx')
+                or (info.get('duration') or 0) * SHM_BYTES_PER_SECOND
+            )
+            # Twice the size: a merge keeps both streams next to the output, and send_video reads
+            # the finished file into memory
+            needed = 2 * expected_size
+            reserved = sum(self.shm_reservations.values())
+            if expected_size and reserved + needed + SHM_MIN_FREE <= _shm_available():
+                job_dir = tempfile.mkdtemp(dir=self.shm_dir)
+                self.shm_reservations[job_dir] = needed
+                return job_dir
+
+        return tempfile.mkdtemp(dir=self.temp_dir)
 
+    def remove_job_dir(self, job_dir: str):
+        """Delete a job directory on a worker thread without waiting for it."""
+        removal = asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, job_dir, True)
+        # Keep a tmpfs job's reservation until its files are actually gone
+        if job_dir in self.shm_reservations:
+            removal.add_done_callback(lambda _: self.shm_reservations.pop(job_dir, None))
+
+    async def send_video(self, update: Update, file_path: str, caption: str):
+        """Reply with a video file and return the sent message."""
+        if LOCAL_BOT_API_URL:
+            # In local mode only the path is sent; the Bot API server reads the file from disk itself
+            return await update.message.reply_video(
+                video=Path(file_path),
+                caption=caption,
+                supports_streaming=True
+            )
+
+        # python-telegram-bot reads file objects synchronously, so load the file on a worker thread instead
+        video_data = await asyncio.to_thread(_read_for_upload, file_path)
+        return await update.message.reply_video(
+            video=video_data,
+            filename=os.path.basename(file_path),
+            caption=caption,
+            supports_streaming=True
+        )
+
+    async def post_init(self, application: Application):
+        """Open the HTTP session and start the pipeline workers once the event loop is running."""
+        self.http_session = aiohttp.ClientSession(timeout=UPLOAD_TIMEOUT)
+        self.workers = [asyncio.create_task(self.download_worker()) for _ in range(MAX_DOWNLOAD_WORKERS)]
+        self.workers += [asyncio.create_task(self.upload_worker()) for _ in range(MAX_UPLOAD_WORKERS)]
+
+    async def post_shutdown(self, application: Application):
+        """Stop the pipeline workers and close the HTTP session."""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        if self.http_session:
+            await self.http_session.close()
 
     def cleanup(self):
         """Clean up temporary files."""
-        try:
-            shutil.rmtree(self.temp_dir)
-        except:
-            pass
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        if self.shm_dir:
+            shutil.rmtree(self.shm_dir, ignore_errors=True)
 
 def main():
     """Start the bot."""
+    log_listener.start()
+
     if not BOT_TOKEN:
         logger.error("FATAL: TELEGRAM_TOKEN environment variable not set.")
+        log_listener.stop()
         return
 
+    if uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     bot = TEDTalkBot()
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Updates are handled concurrently so a slow reply to one user doesn't hold up everyone else's
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # HTTP/2 multiplexes the bot's many small API calls and uploads over one TLS connection.
+        # Set on the builder so its default connection pool (256) is kept
+        .http_version('2')
+        .concurrent_updates(True)
+        .post_init(bot.post_init)
+        .post_shutdown(bot.post_shutdown)
+    )
+    if LOCAL_BOT_API_URL:
+        builder = (
+            builder
+            .base_url(f"{LOCAL_BOT_API_URL}/bot")
+            .base_file_url(f"{LOCAL_BOT_API_URL}/file/bot")
+            .local_mode(True)
+        )
+    application = builder.build()
     
     application.add_handler(CommandHandler("start", bot.start))
     application.add_handler(CommandHandler("help", bot.help_command))
@@ -215,6 +593,8 @@ def main():
         logger.info(f"🛑 Bot shutting down: {e}")
     finally:
         bot.cleanup()
+        DOWNLOAD_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()